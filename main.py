@@ -1,23 +1,95 @@
 import asyncio
+import base64
+import hashlib
+import itertools
 import json
+import os
 import re
 import sys
 import time
 import uuid
-from datetime import datetime
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Optional, Tuple
-from urllib.parse import urljoin
 
+import aiofiles
 import httpx
 from astrbot.api import logger
 from astrbot.api.all import *
 from astrbot.api.event import AstrMessageEvent, filter
+from astrbot.api.message_components import Video
 from astrbot.api.star import Context, Star, StarTools, register
 
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时回退到标准库 json
+    orjson = None
+
+try:
+    import pybase64
+except ImportError:  # pybase64 为可选依赖（SIMD 加速），缺失时回退到标准库 base64
+    pybase64 = None
+
 
 # 移除 NapCat 相关的导入和代码
 
+def _json_dumps(data) -> bytes:
+    """序列化为 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("utf-8")
+
+
+def _json_loads(data: bytes):
+    """解析 JSON 字节串，优先使用 orjson（其异常是 json.JSONDecodeError 的子类）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _file_to_base64(file_path: str) -> str:
+    """读取文件并编码为 base64 字符串（同步，需在线程中调用）"""
+    with open(file_path, "rb") as f:
+        data = f.read()
+    encoded = pybase64.b64encode(data) if pybase64 is not None else base64.b64encode(data)
+    return encoded.decode("ascii")
+
+
+# 速率限制桶的最大条目数，超出后按 LRU 淘汰
+_MAX_TRACKED_ENTRIES = 4096
+
+# 图片 base64 缓存的最大条目数（只需覆盖同一条消息的命令检查与生成两次转换）
+_MAX_IMAGE_CACHE_ENTRIES = 4
+
+# 相同请求（提示词 + 图片）生成结果的缓存容量与有效期
+_MAX_VIDEO_CACHE_ENTRIES = 32
+_VIDEO_CACHE_TTL_SECONDS = 600
+# 缓存非空时后台清理过期视频的间隔，避免空闲时过期文件长期占用磁盘
+_VIDEO_CACHE_SWEEP_INTERVAL_SECONDS = 60
+
+# 视频 URL 提取用的预编译正则：HTML 标签 / 直接链接 / Markdown 合并为一次扫描，
+# 按内容中最先出现的位置匹配，命名分组标识来源；
+# Markdown 链接只截取 URL 本身，不含 <> 包裹和其后的标题
+_RE_VIDEO_URL = re.compile(
+    r'<video[^>]*src=["\'](?P<html>[^"\'>]+)["\'][^>]*>'
+    r'|src=["\'](?P<src>[^"\'>]+\.mp4[^"\'>]*)["\']'
+    r'|!?\[[^\]]*\]\(\s*<?(?P<md>[^\s<>\)]+\.mp4[^\s<>\)]*)'
+    r'|!?\[[^\]]*\]:\s*<?(?P<ref>[^\s<>]+\.mp4[^\s<>]*)'
+    r'|(?P<direct>(?:https?://|/)[^\s<>"\')\]\}]+\.mp4(?:\?[^\s<>"\')\]\}]*)?)',
+    re.IGNORECASE
+)
+
+_VIDEO_URL_SOURCES = {
+    "html": "HTML 标签",
+    "src": "HTML 标签",
+    "md": "Markdown",
+    "ref": "Markdown",
+    "direct": "直接链接",
+}
+
+# 有效视频 URL：http/https 开头、包含 .mp4，且不含 <>"' 及换行/制表符
+_RE_VALID_VIDEO_URL = re.compile(r'https?://[^<>"\'\n\r\t]*(?i:\.mp4)[^<>"\'\n\r\t]*')
+
 @register("grok-video", "Claude", "Grok视频生成插件，支持根据图片和提示词生成视频", "1.0.0")
 class GrokVideoPlugin(Star):
     def __init__(self, context: Context, config: dict):
@@ -42,15 +114,21 @@ class GrokVideoPlugin(Star):
         self.rate_limit_enabled = config.get("rate_limit_enabled", True)
         self.rate_limit_window_seconds = config.get("rate_limit_window_seconds", 3600)
         self.rate_limit_max_calls = config.get("rate_limit_max_calls", 5)
-        self._rate_limit_bucket = {}  # group_id -> {"window_start": float, "count": int}
-        self._rate_limit_locks = {}  # group_id -> asyncio.Lock() 用于并发安全
-        self._processing_tasks = {}  # user_id -> task_id 防止重复触发
+        self._rate_limit_bucket: "OrderedDict[str, tuple[int, int]]" = OrderedDict()  # group_id -> (window_id, count)
+        self._processing_users: set[str] = set()  # 有进行中任务的 user_id，防止重复触发
         
-        # 管理员用户（优化为set提高查询效率）
+        self._image_base64_cache: "OrderedDict[str, str]" = OrderedDict()  # 图片标识 -> base64 data URI
+        self._inflight: dict[str, asyncio.Future] = {}  # 请求哈希 -> 进行中的生成结果，合并重复请求
+        self._video_cache: "OrderedDict[str, tuple[float, str, str]]" = OrderedDict()  # 请求哈希 -> (时间, video_url, local_path)
+        self._video_cache_sweeper: Optional[asyncio.Task] = None  # 缓存非空时运行的定时清理任务
+        
+        # 管理员用户（优化为set提高查询效率），同时保存 int 形式以免每次 str() 转换
         self.admin_users = set(str(u) for u in config.get("admin_users", []))
+        self._admin_users_int = {int(u) for u in self.admin_users if u.isdecimal()}
 
         # 强制启用视频保存，因为要使用 fromFileSystem
         self.save_video_enabled = True 
+        self._file_seq = itertools.count()  # 与纳秒时间戳组合生成唯一文件名
 
         # 使用 AstrBot data 目录保存视频
         try:
@@ -64,8 +142,20 @@ class GrokVideoPlugin(Star):
             self.videos_dir.mkdir(parents=True, exist_ok=True)
             self.videos_dir = self.videos_dir.resolve()
         
-        # 构建完整的API URL
-        self.api_url = urljoin(self.server_url + "/", "v1/chat/completions")
+        # 构建完整的API URL（预先计算前缀，解析相对路径时直接拼接）
+        self._server_prefix = self.server_url + "/"
+        self.api_url = self._server_prefix + "v1/chat/completions"
+
+        # 复用长连接的HTTP客户端，避免每次请求重新建立TCP/TLS连接
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                connect=10.0,
+                read=self.timeout_seconds,
+                write=10.0,
+                pool=self.timeout_seconds + 10
+            ),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
         
         logger.info(f"Grok视频生成插件已初始化，API地址: {self.api_url}")
     
@@ -73,7 +163,10 @@ class GrokVideoPlugin(Star):
 
     def _is_admin(self, event: AstrMessageEvent) -> bool:
         """检查是否为管理员"""
-        return str(event.get_sender_id()) in self.admin_users
+        sender_id = event.get_sender_id()
+        if isinstance(sender_id, int):
+            return sender_id in self._admin_users_int
+        return str(sender_id) in self.admin_users
 
     async def _check_group_access(self, event: AstrMessageEvent) -> Optional[str]:
         """检查群组访问权限和速率限制（并发安全）"""
@@ -90,25 +183,20 @@ class GrokVideoPlugin(Star):
                 if self.group_control_mode == "blacklist" and group_id in self.group_list:
                     return "当前群组已被限制使用视频生成功能"
 
-                if self.rate_limit_enabled:
-                    if group_id not in self._rate_limit_locks:
-                        self._rate_limit_locks[group_id] = asyncio.Lock()
+                # 窗口时长不为正时等同于不限制（每次调用都是新窗口）
+                if self.rate_limit_enabled and self.rate_limit_window_seconds > 0:
+                    # 以下读改写之间没有 await，在事件循环中天然原子，无需加锁
+                    window_id = int(time.monotonic() // self.rate_limit_window_seconds)
+                    wid, count = self._rate_limit_bucket.get(group_id, (window_id, 0))
+                    if wid != window_id:
+                        count = 0
                     
-                    async with self._rate_limit_locks[group_id]:
-                        now = time.time()
-                        bucket = self._rate_limit_bucket.get(group_id, {"window_start": now, "count": 0})
-                        window_start = bucket.get("window_start", now)
-                        count = int(bucket.get("count", 0))
-                        
-                        if now - window_start >= self.rate_limit_window_seconds:
-                            window_start = now
-                            count = 0
-                        
-                        if count >= self.rate_limit_max_calls:
-                            return f"本群调用已达上限（{self.rate_limit_max_calls}次/{self.rate_limit_window_seconds}秒），请稍后再试"
-                        
-                        bucket["window_start"], bucket["count"] = window_start, count + 1
-                        self._rate_limit_bucket[group_id] = bucket
+                    if count >= self.rate_limit_max_calls:
+                        return f"本群调用已达上限（{self.rate_limit_max_calls}次/{self.rate_limit_window_seconds}秒），请稍后再试"
+                    
+                    self._rate_limit_bucket[group_id] = (window_id, count + 1)
+                    self._rate_limit_bucket.move_to_end(group_id)
+                    self._evict_rate_limit_buckets(window_id)
 
         except Exception as e:
             logger.error(f"群组访问检查失败: {e}")
@@ -116,18 +204,60 @@ class GrokVideoPlugin(Star):
         
         return None
 
-    async def _extract_images_from_message(self, event: AstrMessageEvent) -> List[str]:
-        """从消息中提取图片的base64数据"""
+    def _evict_rate_limit_buckets(self, window_id: int):
+        """淘汰已过期窗口及超出容量的速率限制桶（按最近写入排序，过期项总在队首）"""
+        bucket = self._rate_limit_bucket
+        while bucket:
+            wid, _ = next(iter(bucket.values()))
+            if wid >= window_id and len(bucket) <= _MAX_TRACKED_ENTRIES:
+                break
+            bucket.popitem(last=False)
+
+    async def _image_to_base64(self, comp: Image) -> Optional[str]:
+        """将图片组件转为 base64 data URI，按图片标识缓存避免重复编码"""
+        source = getattr(comp, "url", None) or getattr(comp, "file", None)
+        # base64:// 图片数据已在内存中，无需缓存；否则以其为键会额外常驻一份完整图片
+        if source and source.startswith("base64://"):
+            cache_key = None
+        else:
+            cache_key = getattr(comp, "file_unique", None) or source
+        if cache_key and cache_key in self._image_base64_cache:
+            self._image_base64_cache.move_to_end(cache_key)
+            return self._image_base64_cache[cache_key]
+        
+        # 读文件与 base64 编码放到线程中执行，避免大图阻塞事件循环
+        if not source:
+            return None
+        if source.startswith("base64://"):
+            base64_data = source.removeprefix("base64://")
+        elif source.startswith("file:///"):
+            base64_data = await asyncio.to_thread(_file_to_base64, source[8:])
+        elif source.startswith("http"):
+            image_path = await comp.convert_to_file_path()
+            base64_data = await asyncio.to_thread(_file_to_base64, image_path)
+        else:
+            base64_data = await asyncio.to_thread(_file_to_base64, source)
+        if not base64_data:
+            return None
+        if not base64_data.startswith('data:'):
+            base64_data = f"data:image/jpeg;base64,{base64_data}"
+        
+        if cache_key:
+            self._image_base64_cache[cache_key] = base64_data
+            while len(self._image_base64_cache) > _MAX_IMAGE_CACHE_ENTRIES:
+                self._image_base64_cache.popitem(last=False)
+        return base64_data
+
+    async def _extract_images_from_message(self, event: AstrMessageEvent, limit: int = 1) -> List[str]:
+        """从消息中提取图片的base64数据，最多转换 limit 张"""
         images = []
         
         if hasattr(event, 'message_obj') and event.message_obj and hasattr(event.message_obj, 'message'):
             for comp in event.message_obj.message:
                 if isinstance(comp, Image):
                     try:
-                        base64_data = await comp.convert_to_base64()
+                        base64_data = await self._image_to_base64(comp)
                         if base64_data:
-                            if not base64_data.startswith('data:'):
-                                base64_data = f"data:image/jpeg;base64,{base64_data}"
                             images.append(base64_data)
                     except Exception as e:
                         logger.warning(f"图片转base64失败: {e}")
@@ -135,13 +265,15 @@ class GrokVideoPlugin(Star):
                     for reply_comp in comp.chain:
                         if isinstance(reply_comp, Image):
                             try:
-                                base64_data = await reply_comp.convert_to_base64()
+                                base64_data = await self._image_to_base64(reply_comp)
                                 if base64_data:
-                                    if not base64_data.startswith('data:'):
-                                        base64_data = f"data:image/jpeg;base64,{base64_data}"
                                     images.append(base64_data)
                             except Exception as e:
                                 logger.warning(f"引用图片转base64失败: {e}")
+                        if len(images) >= limit:
+                            return images
+                if len(images) >= limit:
+                    return images
         
         return images
 
@@ -177,65 +309,60 @@ class GrokVideoPlugin(Star):
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        timeout_config = httpx.Timeout(
-            connect=10.0,
-            read=self.timeout_seconds,
-            write=10.0,
-            pool=self.timeout_seconds + 10
-        )
+        # 请求体只序列化一次，重试时复用
+        body = _json_dumps(payload)
         
         for attempt in range(self.max_retry_attempts):
             try:
                 logger.info(f"调用Grok API (尝试 {attempt + 1}/{self.max_retry_attempts})")
                 
-                async with httpx.AsyncClient(timeout=timeout_config) as client:
-                    response = await client.post(
-                        self.api_url,
-                        json=payload,
-                        headers=headers
-                    )
-                    
-                    logger.info(f"API响应状态码: {response.status_code}")
-                    response_text = response.text
-                    
-                    if response.status_code == 200:
-                        try:
-                            result = response.json()
-                            
-                            # URL 提取和解析
-                            video_url, parse_error = self._extract_video_url_from_response(result)
-                            if parse_error:
-                                return None, parse_error
-                            
-                            if video_url:
-                                logger.info(f"成功提取到视频URL: {video_url}")
-                                return video_url, None
-                            else:
-                                return None, "API响应中未包含有效的视频URL"
-                        except json.JSONDecodeError as e:
-                            return None, f"API响应JSON解析失败: {str(e)}, 响应内容: {response_text[:200]}"
-                    
-                    elif response.status_code == 403:
-                        return None, "API访问被拒绝，请检查密钥和权限"
-                    
-                    else:
-                        error_msg = f"API请求失败 (状态码: {response.status_code})"
-                        try:
-                            error_detail = response.json()
-                            if "error" in error_detail:
-                                error_msg += f": {error_detail['error']}"
-                            elif "message" in error_detail:
-                                error_msg += f": {error_detail['message']}"
-                            else:
-                                error_msg += f": {error_detail}"
-                        except:
-                            error_msg += f": {response_text[:200]}"
+                response = await self._http.post(
+                    self.api_url,
+                    content=body,
+                    headers=headers
+                )
+                
+                logger.info(f"API响应状态码: {response.status_code}")
+                response_text = response.text
+                
+                if response.status_code == 200:
+                    try:
+                        result = _json_loads(response.content)
                         
-                        if attempt == self.max_retry_attempts - 1:
-                            return None, error_msg
+                        # URL 提取和解析
+                        video_url, parse_error = self._extract_video_url_from_response(result)
+                        if parse_error:
+                            return None, parse_error
                         
-                        logger.warning(f"{error_msg}，等待重试...")
-                        await asyncio.sleep(2)
+                        if video_url:
+                            logger.info(f"成功提取到视频URL: {video_url}")
+                            return video_url, None
+                        else:
+                            return None, "API响应中未包含有效的视频URL"
+                    except json.JSONDecodeError as e:
+                        return None, f"API响应JSON解析失败: {str(e)}, 响应内容: {response_text[:200]}"
+                
+                elif response.status_code == 403:
+                    return None, "API访问被拒绝，请检查密钥和权限"
+                
+                else:
+                    error_msg = f"API请求失败 (状态码: {response.status_code})"
+                    try:
+                        error_detail = _json_loads(response.content)
+                        if "error" in error_detail:
+                            error_msg += f": {error_detail['error']}"
+                        elif "message" in error_detail:
+                            error_msg += f": {error_detail['message']}"
+                        else:
+                            error_msg += f": {error_detail}"
+                    except:
+                        error_msg += f": {response_text[:200]}"
+                    
+                    if attempt == self.max_retry_attempts - 1:
+                        return None, error_msg
+                    
+                    logger.warning(f"{error_msg}，等待重试...")
+                    await asyncio.sleep(2)
             
             except httpx.TimeoutException:
                 error_msg = f"请求超时 ({self.timeout_seconds}秒)"
@@ -262,7 +389,7 @@ class GrokVideoPlugin(Star):
             
         # 如果是相对路径，使用 self.server_url 拼接
         if url.startswith("/"):
-            resolved_url = urljoin(self.server_url + "/", url.lstrip("/"))
+            resolved_url = self._server_prefix + url.lstrip("/")
             logger.info(f"相对路径已解析为: {resolved_url}")
             url = resolved_url
             
@@ -295,7 +422,7 @@ class GrokVideoPlugin(Star):
                 return None, f"content 不是字符串类型: {type(content)}"
             
             # 3. 优先尝试结构化解析
-            video_url = self._try_structured_extraction(response_data)
+            video_url = self._try_structured_extraction(response_data, message)
             resolved_url = self._resolve_url(video_url)
             if resolved_url:
                 return resolved_url, None
@@ -314,20 +441,18 @@ class GrokVideoPlugin(Star):
             logger.error(f"URL 提取过程中发生异常: {e}")
             return None, f"URL 提取失败: {str(e)}"
     
-    def _try_structured_extraction(self, response_data: dict) -> Optional[str]:
-        """尝试从结构化数据中提取 URL，不进行 URL 验证。"""
+    def _try_structured_extraction(self, response_data: dict, message: dict) -> Optional[str]:
+        """尝试从结构化数据中提取 URL，不进行 URL 验证。message 为已取出的 choices[0].message"""
         try:
             if "video_url" in response_data:
                 url = response_data["video_url"]
                 if isinstance(url, str):
                     return url
             
-            choice = response_data.get("choices", [{}])[0]
-            message = choice.get("message", {})
-            
-            for field in ["attachments", "media", "files"]:
-                if field in message and isinstance(message[field], list):
-                    for item in message[field]:
+            for field in ("attachments", "media", "files"):
+                items = message.get(field)
+                if isinstance(items, list):
+                    for item in items:
                         if isinstance(item, dict) and "url" in item:
                             url = item["url"]
                             if isinstance(url, str) and url.lower().endswith(".mp4"):
@@ -340,70 +465,27 @@ class GrokVideoPlugin(Star):
     
     def _try_content_extraction(self, content: str) -> Optional[str]:
         """从文本内容中提取 URL，不进行 URL 验证。"""
-        try:
-            video_url = self._extract_from_html_tag(content)
-            if video_url: return video_url
-            video_url = self._extract_direct_url(content)
-            if video_url: return video_url
-            video_url = self._extract_from_markdown(content)
-            if video_url: return video_url
+        # 不含 mp4 或 <video 时不可能匹配，跳过正则扫描
+        lowered = content.lower()
+        if "mp4" not in lowered and "<video" not in lowered:
             return None
+        try:
+            match = _RE_VIDEO_URL.search(content)
+            if not match:
+                return None
+            url = match.group(match.lastgroup)
+            logger.debug(f"从 {_VIDEO_URL_SOURCES[match.lastgroup]} 提取到 URL: {url}")
+            return url
         except Exception as e:
             logger.debug(f"内容提取失败: {e}")
             return None
     
-    def _extract_from_html_tag(self, content: str) -> Optional[str]:
-        """从 HTML video 标签中提取 URL，不进行 URL 验证"""
-        if "<video" not in content or "src=" not in content:
-            return None
-        patterns = [
-            r'<video[^>]*src=["\']([^"\'>]+)["\'][^>]*>',
-            r'src=["\']([^"\'>]+\.mp4[^"\'>]*)["\']',
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                url = match.group(1)
-                logger.debug(f"从 HTML 标签提取到 URL: {url}")
-                return url
-        return None
-    
-    def _extract_direct_url(self, content: str) -> Optional[str]:
-        """提取直接的 .mp4 URL，不进行 URL 验证"""
-        pattern = r'((?:https?://|/)[^\s<>"\')\]\}]+\.mp4(?:\?[^\s<>"\')\]\}]*)?)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        for url in matches:
-            logger.debug(f"提取到直接 URL: {url}")
-            return url
-        return None
-    
-    def _extract_from_markdown(self, content: str) -> Optional[str]:
-        """从 Markdown 链接中提取 URL，不进行 URL 验证"""
-        patterns = [
-            r'!?\[[^\]]*\]\(([^\)]+\.mp4[^\)]*)\)',
-            r'!?\[[^\]]*\]:\s*([^\s]+\.mp4[^\s]*)',
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                url = match.group(1)
-                logger.debug(f"从 Markdown 提取到 URL: {url}")
-                return url
-        return None
-    
     def _is_valid_video_url(self, url: str) -> bool:
         """验证 URL 是否为有效的视频 URL (仅检查绝对路径)"""
-        if not isinstance(url, str) or len(url) < 10:
+        if not isinstance(url, str):
             return False
-        # 必须是 http 或 https 开头
-        if not url.startswith(("http://", "https://")):
-            return False
-        if not url.lower().endswith(".mp4") and ".mp4" not in url.lower():
-            return False
-        invalid_chars = ['<', '>', '"', "'", '\n', '\r', '\t']
-        if any(char in url for char in invalid_chars):
-            return False
-        return True
+        # 一次匹配完成：http/https 开头、包含 .mp4、不含非法字符
+        return _RE_VALID_VIDEO_URL.fullmatch(url) is not None
 
     # --- 视频下载和发送逻辑 (强制 fromFileSystem) ---
 
@@ -413,19 +495,23 @@ class GrokVideoPlugin(Star):
             # 使用配置中的 server_url 来访问 A 端进行下载
             timeout_config = httpx.Timeout(connect=10.0, read=300.0, write=10.0, pool=300.0)
             
-            async with httpx.AsyncClient(timeout=timeout_config) as client:
-                response = await client.get(video_url)
-                response.raise_for_status()
-                
-                filename = f"grok_video_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.mp4"
-                file_path = self.videos_dir / filename
-                
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                
-                absolute_path = file_path.resolve()
-                logger.info(f"视频已保存到 B 容器/本地文件系统: {absolute_path}")
-                return str(absolute_path)
+            filename = f"grok_video_{time.time_ns()}_{next(self._file_seq):06x}.mp4"
+            file_path = self.videos_dir / filename
+
+            # 流式下载并分块写入，避免整个视频驻留内存
+            try:
+                async with self._http.stream("GET", video_url, timeout=timeout_config) as response:
+                    response.raise_for_status()
+                    async with aiofiles.open(file_path, 'wb') as f:
+                        async for chunk in response.aiter_bytes(chunk_size=1 << 16):
+                            await f.write(chunk)
+            except Exception:
+                await asyncio.to_thread(file_path.unlink, missing_ok=True)
+                raise
+
+            # videos_dir 在初始化时已 resolve，拼接结果即为绝对路径，无需再次 resolve
+            logger.info(f"视频已保存到 B 容器/本地文件系统: {file_path}")
+            return str(file_path)
             
         except Exception as e:
             logger.error(f"下载视频失败: {e}")
@@ -444,6 +530,14 @@ class GrokVideoPlugin(Star):
             return
         if not self.save_video_enabled: 
             return
+        # 仍在结果缓存中的视频由缓存淘汰时统一清理
+        if any(cached_path == video_path for _, _, cached_path in self._video_cache.values()):
+            return
+        # 文件系统操作放到线程中，避免挂载卷上的 stat/unlink 阻塞事件循环
+        await asyncio.to_thread(self._cleanup_video_file_sync, video_path)
+
+    def _cleanup_video_file_sync(self, video_path: str):
+        """同步删除本地视频文件"""
         try:
             path = Path(video_path)
             if path.exists():
@@ -454,8 +548,6 @@ class GrokVideoPlugin(Star):
 
     async def _create_video_component(self, final_send_path: Optional[str], video_url: Optional[str] = None):
         """强制使用 Video.fromFileSystem。"""
-        from astrbot.api.message_components import Video
-
         if not final_send_path:
             raise ValueError("最终发送路径缺失，无法发送视频")
         
@@ -475,7 +567,46 @@ class GrokVideoPlugin(Star):
             return None, None, "未找到图片，请在消息中包含图片或引用包含图片的消息"
         
         image_base64 = images[0]
+        cache_key = hashlib.blake2b(
+            prompt.encode("utf-8") + b"\0" + image_base64.encode("ascii", "ignore"), digest_size=16
+        ).hexdigest()
+        
+        # 复用近期相同请求的结果
+        await self._evict_video_cache()
+        cached = self._video_cache.get(cache_key)
+        # 等待文件检查期间缓存可能已被淘汰，需确认条目未变
+        if (
+            cached
+            and await asyncio.to_thread(os.path.exists, cached[2])
+            and self._video_cache.get(cache_key) is cached
+        ):
+            self._video_cache[cache_key] = (time.monotonic(), cached[1], cached[2])
+            self._video_cache.move_to_end(cache_key)
+            logger.info(f"命中相同请求的视频缓存: {cached[2]}")
+            return cached[1], cached[2], None
+        
+        # 相同请求正在生成时直接等待其结果，避免重复调用 API
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            logger.info("相同请求正在生成中，等待其结果")
+            return await asyncio.shield(inflight)
         
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        result = (None, None, "视频生成失败，请稍后再试")
+        try:
+            result = await self._request_video(prompt, image_base64)
+            if result[1]:
+                self._video_cache[cache_key] = (time.monotonic(), result[0], result[1])
+                await self._evict_video_cache()
+                self._ensure_video_cache_sweeper()
+            return result
+        finally:
+            self._inflight.pop(cache_key, None)
+            future.set_result(result)
+
+    async def _request_video(self, prompt: str, image_base64: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """调用 API 生成视频并下载到本地"""
         video_url, error_msg = await self._call_grok_api(prompt, image_base64)
         if error_msg:
             return None, None, error_msg
@@ -490,6 +621,35 @@ class GrokVideoPlugin(Star):
 
         return video_url, local_path, None
 
+    async def _evict_video_cache(self):
+        """淘汰过期及超出容量的视频结果缓存，并删除对应的本地文件"""
+        now = time.monotonic()
+        expired = []
+        while self._video_cache:
+            created_at, _, _ = next(iter(self._video_cache.values()))
+            if now - created_at < _VIDEO_CACHE_TTL_SECONDS and len(self._video_cache) <= _MAX_VIDEO_CACHE_ENTRIES:
+                break
+            _, (_, _, path) = self._video_cache.popitem(last=False)
+            expired.append(path)
+        for path in expired:
+            await self._cleanup_video_file(path)
+
+    def _ensure_video_cache_sweeper(self):
+        """缓存中有视频时确保定时清理任务在运行"""
+        if self._video_cache and (self._video_cache_sweeper is None or self._video_cache_sweeper.done()):
+            self._video_cache_sweeper = asyncio.create_task(self._sweep_video_cache())
+
+    async def _sweep_video_cache(self):
+        """定时淘汰过期缓存，缓存清空后退出，下次写入缓存时重新启动"""
+        try:
+            while self._video_cache:
+                await asyncio.sleep(_VIDEO_CACHE_SWEEP_INTERVAL_SECONDS)
+                await self._evict_video_cache()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"定时清理视频缓存失败: {e}")
+
     async def _async_generate_video(self, event: AstrMessageEvent, prompt: str, task_id: str):
         """异步视频生成，避免超时和重复触发"""
         user_id = str(event.get_sender_id())
@@ -546,9 +706,9 @@ class GrokVideoPlugin(Star):
         finally:
             await self._cleanup_video_file(video_path)
             
-            if user_id in self._processing_tasks and self._processing_tasks[user_id] == task_id:
-                del self._processing_tasks[user_id]
-                logger.info(f"用户 {user_id} 的任务 {task_id} 已完成")
+            # 每个用户同一时间只有一个任务，无需再核对 task_id
+            self._processing_users.discard(user_id)
+            logger.info(f"用户 {user_id} 的任务 {task_id} 已完成")
 
     # --- 命令函数 (保持不变) ---
 
@@ -561,19 +721,21 @@ class GrokVideoPlugin(Star):
             return
         
         user_id = str(event.get_sender_id())
-        if user_id in self._processing_tasks:
+        if user_id in self._processing_users:
             yield event.plain_result(f"⚠️ 您已有一个视频生成任务在进行中，请等待完成后再试。")
             return
         
-        images = await self._extract_images_from_message(event)
-        if not images:
-            yield event.plain_result("❌ 视频生成需要您在消息中包含图片。请上传图片后再试。")
-            return
-        
+        # 在首个 await 之前登记：图片转换会在线程中执行并挂起，
+        # 晚登记会让同一用户的并发命令同时通过上面的检查
+        self._processing_users.add(user_id)
+        task_started = False
         try:
-            import uuid
+            images = await self._extract_images_from_message(event)
+            if not images:
+                yield event.plain_result("❌ 视频生成需要您在消息中包含图片。请上传图片后再试。")
+                return
+            
             task_id = str(uuid.uuid4())[:8]
-            self._processing_tasks[user_id] = task_id
             
             yield event.plain_result(
                 f"🎥 正在使用Grok为您生成视频，请稍候（预计需要几分钟）...\n"
@@ -582,10 +744,16 @@ class GrokVideoPlugin(Star):
             )
             
             asyncio.create_task(self._async_generate_video(event, prompt, task_id))
+            task_started = True
         
         except Exception as e:
             logger.error(f"视频生成命令异常: {e}")
             yield event.plain_result(f"❌ 生成视频时遇到问题: {str(e)}")
+        
+        finally:
+            # 未能启动后台任务时由这里释放，启动后由 _async_generate_video 释放
+            if not task_started:
+                self._processing_users.discard(user_id)
 
     @filter.command("grok测试")
     async def cmd_test(self, event: AstrMessageEvent):
@@ -633,5 +801,11 @@ class GrokVideoPlugin(Star):
 
     async def terminate(self):
         """插件卸载时调用"""
-        self._rate_limit_locks.clear()
+        if self._video_cache_sweeper is not None:
+            self._video_cache_sweeper.cancel()
+        cached_paths = [path for _, _, path in self._video_cache.values()]
+        self._video_cache.clear()
+        for path in cached_paths:
+            await self._cleanup_video_file(path)
+        await self._http.aclose()
         logger.info("Grok视频生成插件已卸载")
@@ -0,0 +1,47 @@
+import itertools
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import astrbot  # noqa: F401
+except ImportError:  # 测试依赖 AstrBot，未安装时跳过收集
+    collect_ignore_glob = ["test_*.py"]
+
+
+@pytest.fixture
+def plugin(tmp_path):
+    """未执行 __init__ 的插件实例，仅初始化内存状态，避免依赖 AstrBot 运行环境与网络客户端"""
+    from main import GrokVideoPlugin
+
+    instance = object.__new__(GrokVideoPlugin)
+    instance.config = {}
+    instance.server_url = "https://api.example.com"
+    instance._server_prefix = instance.server_url + "/"
+    instance.api_url = instance._server_prefix + "v1/chat/completions"
+    instance.model_id = "grok-imagine-0.9"
+    instance.api_key = "test-key"
+    instance.enabled = True
+    instance.timeout_seconds = 180
+    instance.max_retry_attempts = 3
+    instance.group_control_mode = "off"
+    instance.group_list = []
+    instance.rate_limit_enabled = True
+    instance.rate_limit_window_seconds = 3600
+    instance.rate_limit_max_calls = 5
+    instance._rate_limit_bucket = OrderedDict()
+    instance._processing_users = set()
+    instance._image_base64_cache = OrderedDict()
+    instance._inflight = {}
+    instance._video_cache = OrderedDict()
+    instance._video_cache_sweeper = None
+    instance.admin_users = set()
+    instance._admin_users_int = set()
+    instance.save_video_enabled = True
+    instance._file_seq = itertools.count()
+    instance.videos_dir = tmp_path
+    return instance
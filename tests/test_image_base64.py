@@ -0,0 +1,23 @@
+import asyncio
+import base64
+
+from astrbot.api.message_components import Image
+
+
+def test_base64_source_is_not_cached(plugin):
+    encoded = base64.b64encode(b"fake-image").decode("ascii")
+    data_uri = asyncio.run(plugin._image_to_base64(Image.fromBase64(encoded)))
+    assert data_uri == f"data:image/jpeg;base64,{encoded}"
+    assert not plugin._image_base64_cache
+
+
+def test_file_source_is_cached(plugin, tmp_path):
+    image_path = tmp_path / "a.jpg"
+    image_path.write_bytes(b"fake-image")
+    comp = Image.fromFileSystem(str(image_path))
+
+    first = asyncio.run(plugin._image_to_base64(comp))
+    image_path.unlink()
+    # 文件已删除，仍能从缓存返回同一结果
+    assert asyncio.run(plugin._image_to_base64(comp)) == first
+    assert first == "data:image/jpeg;base64," + base64.b64encode(b"fake-image").decode("ascii")
@@ -0,0 +1,30 @@
+import asyncio
+
+
+class _GroupEvent:
+    def __init__(self, group_id: str):
+        self._group_id = group_id
+
+    def get_group_id(self):
+        return self._group_id
+
+
+def _check(plugin, group_id: str = "10001"):
+    return asyncio.run(plugin._check_group_access(_GroupEvent(group_id)))
+
+
+def test_rate_limit_blocks_after_max_calls(plugin):
+    plugin.rate_limit_max_calls = 2
+    assert _check(plugin) is None
+    assert _check(plugin) is None
+    assert _check(plugin)
+    # 其他群不受影响
+    assert _check(plugin, "10002") is None
+
+
+def test_rate_limit_disabled_for_non_positive_window(plugin):
+    plugin.rate_limit_window_seconds = 0
+    plugin.rate_limit_max_calls = 1
+    for _ in range(3):
+        assert _check(plugin) is None
+    assert not plugin._rate_limit_bucket
@@ -0,0 +1,71 @@
+import asyncio
+
+
+class _CommandEvent:
+    def __init__(self, sender_id: str = "42"):
+        self._sender_id = sender_id
+        self.sent = []
+
+    def get_sender_id(self):
+        return self._sender_id
+
+    def get_group_id(self):
+        return None
+
+    def plain_result(self, text: str):
+        return text
+
+    async def send(self, result):
+        self.sent.append(result)
+
+
+async def _run_command(plugin, event):
+    return [result async for result in plugin.cmd_generate_video(event, prompt="让太阳升起来")]
+
+
+def _patch_generation(plugin, images, release: asyncio.Event, started: list):
+    async def fake_extract(event, limit=1):
+        # 模拟图片转换在线程中执行时的挂起
+        await asyncio.sleep(0)
+        return list(images)
+
+    async def fake_core(event, prompt):
+        started.append(prompt)
+        await release.wait()
+        return None, None, "测试结束"
+
+    plugin._extract_images_from_message = fake_extract
+    plugin._generate_video_core = fake_core
+
+
+def test_concurrent_commands_from_same_user_start_one_task(plugin):
+    async def scenario():
+        release = asyncio.Event()
+        started = []
+        _patch_generation(plugin, ["data:image/jpeg;base64,AAAA"], release, started)
+
+        first, second = await asyncio.gather(
+            _run_command(plugin, _CommandEvent()),
+            _run_command(plugin, _CommandEvent()),
+        )
+        await asyncio.sleep(0)
+        assert len(started) == 1
+        assert sum("已有一个视频生成任务" in r for r in first + second) == 1
+        assert "42" in plugin._processing_users
+
+        release.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert "42" not in plugin._processing_users
+
+    asyncio.run(scenario())
+
+
+def test_command_without_image_releases_user(plugin):
+    async def scenario():
+        _patch_generation(plugin, [], asyncio.Event(), [])
+        results = await _run_command(plugin, _CommandEvent())
+        assert "需要您在消息中包含图片" in results[-1]
+        assert not plugin._processing_users
+
+    asyncio.run(scenario())
@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import main
+
+
+def _patch_generation(plugin, tmp_path, release: asyncio.Event = None, fail: bool = False):
+    """让 _generate_video_core 使用假的图片提取与生成，返回记录生成调用的列表"""
+    calls = []
+
+    async def fake_extract(event, limit=1):
+        # 测试中直接用 event 充当图片数据
+        return [event]
+
+    async def fake_request(prompt, image_base64):
+        calls.append((prompt, image_base64))
+        if release is not None:
+            await release.wait()
+        if fail:
+            return None, None, "API请求失败"
+        path = tmp_path / f"video_{len(calls)}.mp4"
+        path.write_bytes(b"mp4")
+        return f"https://cdn.example.com/{path.name}", str(path), None
+
+    plugin._extract_images_from_message = fake_extract
+    plugin._request_video = fake_request
+    return calls
+
+
+def test_identical_requests_share_one_generation(plugin, tmp_path):
+    async def scenario():
+        release = asyncio.Event()
+        calls = _patch_generation(plugin, tmp_path, release)
+
+        first = asyncio.create_task(plugin._generate_video_core("img", "p"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(plugin._generate_video_core("img", "p"))
+        cancelled = asyncio.create_task(plugin._generate_video_core("img", "p"))
+        await asyncio.sleep(0)
+        assert len(plugin._inflight) == 1
+
+        # 等待方被取消不影响进行中的生成（asyncio.shield）
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, second)
+
+        assert len(calls) == 1
+        assert results[0] == results[1]
+        assert results[0][2] is None
+        assert not plugin._inflight
+
+    asyncio.run(scenario())
+
+
+def test_failed_result_is_shared_but_not_cached(plugin, tmp_path):
+    async def scenario():
+        release = asyncio.Event()
+        calls = _patch_generation(plugin, tmp_path, release, fail=True)
+
+        first = asyncio.create_task(plugin._generate_video_core("img", "p"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(plugin._generate_video_core("img", "p"))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, second)
+
+        assert [r[2] for r in results] == ["API请求失败", "API请求失败"]
+        assert not plugin._video_cache
+
+        await plugin._generate_video_core("img", "p")
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_cache_hit_reuses_file_and_survives_cleanup(plugin, tmp_path):
+    async def scenario():
+        calls = _patch_generation(plugin, tmp_path)
+
+        _, path, _ = await plugin._generate_video_core("img", "p")
+        # 发送后的清理不能删除仍在缓存中的视频
+        await plugin._cleanup_video_file(path)
+        assert (tmp_path / "video_1.mp4").exists()
+
+        _, cached_path, error = await plugin._generate_video_core("img", "p")
+        assert error is None
+        assert cached_path == path
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_cache_misses_after_file_deleted(plugin, tmp_path):
+    async def scenario():
+        calls = _patch_generation(plugin, tmp_path)
+
+        _, path, _ = await plugin._generate_video_core("img", "p")
+        (tmp_path / "video_1.mp4").unlink()
+
+        _, new_path, _ = await plugin._generate_video_core("img", "p")
+        assert len(calls) == 2
+        assert new_path != path
+
+    asyncio.run(scenario())
+
+
+def test_expired_entry_is_evicted_and_deleted(plugin, tmp_path):
+    async def scenario():
+        path = tmp_path / "old.mp4"
+        path.write_bytes(b"mp4")
+        expired_at = time.monotonic() - main._VIDEO_CACHE_TTL_SECONDS - 1
+        plugin._video_cache["key"] = (expired_at, "https://cdn.example.com/old.mp4", str(path))
+
+        await plugin._evict_video_cache()
+        assert not plugin._video_cache
+        assert not path.exists()
+
+    asyncio.run(scenario())
+
+
+def test_capacity_eviction_deletes_oldest_file(plugin, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_MAX_VIDEO_CACHE_ENTRIES", 1)
+
+    async def scenario():
+        _patch_generation(plugin, tmp_path)
+
+        _, first_path, _ = await plugin._generate_video_core("img-a", "p")
+        _, second_path, _ = await plugin._generate_video_core("img-b", "p")
+
+        assert [entry[2] for entry in plugin._video_cache.values()] == [second_path]
+        assert not (tmp_path / "video_1.mp4").exists()
+        assert (tmp_path / "video_2.mp4").exists()
+
+    asyncio.run(scenario())
+
+
+def test_sweeper_deletes_expired_videos_without_new_requests(plugin, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_VIDEO_CACHE_TTL_SECONDS", 0.05)
+    monkeypatch.setattr(main, "_VIDEO_CACHE_SWEEP_INTERVAL_SECONDS", 0.02)
+
+    async def scenario():
+        _patch_generation(plugin, tmp_path)
+
+        await plugin._generate_video_core("img", "p")
+        sweeper = plugin._video_cache_sweeper
+        assert sweeper is not None
+
+        await asyncio.wait_for(sweeper, timeout=2)
+        assert not plugin._video_cache
+        assert not (tmp_path / "video_1.mp4").exists()
+
+    asyncio.run(scenario())
@@ -0,0 +1,29 @@
+import pytest
+
+
+def _response(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ('<video controls src="/files/a.mp4"></video>', "https://api.example.com/files/a.mp4"),
+        ("视频地址：https://cdn.x/a.mp4?t=1", "https://cdn.x/a.mp4?t=1"),
+        ("[v](https://cdn.x/a.mp4)", "https://cdn.x/a.mp4"),
+        ("[v]: https://cdn.x/b.mp4", "https://cdn.x/b.mp4"),
+        # Markdown 链接带标题或尖括号时只取 URL 本身
+        ('[视频](https://cdn.x/a.mp4 "生成的视频")', "https://cdn.x/a.mp4"),
+        ("[v](<https://cdn.x/a.mp4>)", "https://cdn.x/a.mp4"),
+    ],
+)
+def test_extract_video_url_from_content(plugin, content, expected):
+    video_url, error = plugin._extract_video_url_from_response(_response(content))
+    assert error is None
+    assert video_url == expected
+
+
+def test_extract_video_url_without_video(plugin):
+    video_url, error = plugin._extract_video_url_from_response(_response("生成失败，请重试"))
+    assert video_url is None
+    assert error